@@ -1,76 +1,154 @@
 #!/usr/bin/env python3
-import argparse
-import csv
+import io
 import json
+import math
+import os
 import sys
 from collections import defaultdict
-from statistics import mean
+from operator import itemgetter
+from types import SimpleNamespace
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is the fallback
+    orjson = None
+
+if orjson is not None:
+
+    def loads(payload):
+        try:
+            data = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN and Infinity; json.loads accepts them.
+            return json.loads(payload)
+        if type(data) is dict and type(data.get("label")) is float:
+            # orjson reads integers beyond 64 bits as lossy floats; keep such labels exact.
+            return json.loads(payload)
+        return data
+
+else:
+    loads = json.loads
+
+METRIC_KEYS = (
+    "base_events",
+    "predicted_events",
+    "scenario_created",
+    "scenario_retired",
+    "scenario_alerts",
+    "scenario_active_peak",
+)
 
 
 def parse_line(line):
-    idx = line.find("json=")
+    idx = line.find(b"json=")
     if idx == -1:
-        if line.startswith("{") and line.rstrip().endswith("}"):
+        if line.startswith(b"{") and line.rstrip().endswith(b"}"):
+            if b'"label"' not in line:
+                return None
             try:
-                return json.loads(line)
-            except json.JSONDecodeError:
+                return loads(line)
+            except ValueError:
                 return None
         return None
     payload = line[idx + 5 :].strip()
-    if not payload:
+    if not payload or b'"label"' not in payload:
         return None
     try:
-        return json.loads(payload)
-    except json.JSONDecodeError:
+        return loads(payload)
+    except ValueError:
         return None
 
 
-def load_metrics(paths):
+READ_BUFFER_SIZE = 1 << 20
+PARALLEL_MIN_BYTES = 64 << 20
+
+
+def iter_metrics(path):
+    handle = sys.stdin.buffer if path == "-" else open(path, "rb", buffering=READ_BUFFER_SIZE)
+    with handle:
+        for line in handle:
+            data = parse_line(line)
+            if data is not None and "label" in data:
+                yield data
+
+
+def _aggregate_one(path):
+    return aggregate(iter_metrics(path))
+
+
+def aggregate_files(paths):
     if not paths:
         paths = ["-"]
-    bundles = []
-    for path in paths:
-        if path == "-" and len(paths) > 1:
-            raise ValueError("stdin ('-') cannot be combined with other paths")
-        handle = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
-        metrics = []
-        with handle:
-            for line in handle:
-                data = parse_line(line)
-                if data is not None and "label" in data:
-                    metrics.append(data)
-        bundles.append((path, metrics))
-    return bundles
+    if "-" in paths and len(paths) > 1:
+        raise ValueError("stdin ('-') cannot be combined with other paths")
+    workers = min(len(paths), os.cpu_count() or 1)
+    if workers > 1 and sum(map(os.path.getsize, paths)) >= PARALLEL_MIN_BYTES:
+        from concurrent.futures import ProcessPoolExecutor
 
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(zip(paths, executor.map(_aggregate_one, paths)))
+    return [(path, _aggregate_one(path)) for path in paths]
 
-def summarize(metrics):
+
+def aggregate(metrics):
     grouped = defaultdict(list)
     for item in metrics:
         grouped[item["label"]].append(item)
-    results = {}
+    aggregates = {}
     for label, items in grouped.items():
-        totals = defaultdict(float)
-        elapsed = []
-        for entry in items:
-            for key in (
-                "base_events",
-                "predicted_events",
-                "scenario_created",
-                "scenario_retired",
-                "scenario_alerts",
-                "scenario_active_peak",
-            ):
-                if key in entry:
-                    totals[key] += entry[key]
-            if "elapsed_ms" in entry and entry["elapsed_ms"] is not None:
-                elapsed.append(entry["elapsed_ms"])
-        avg_elapsed = mean(elapsed) if elapsed else None
+        totals = {}
+        first_seen = {}
+        for key in METRIC_KEYS:
+            try:
+                totals[key] = float(sum(map(itemgetter(key), items)))
+            except KeyError:
+                column = [entry[key] for entry in items if key in entry]
+                if column:
+                    totals[key] = float(sum(column))
+                    first_seen[key] = next(i for i, entry in enumerate(items) if key in entry)
+        if first_seen:
+            # Keys missing from some entries keep the order in which entries first report them.
+            totals = {key: totals[key] for key in sorted(totals, key=lambda k: first_seen.get(k, 0))}
+        try:
+            elapsed = list(map(itemgetter("elapsed_ms"), items))
+        except KeyError:
+            elapsed = [entry.get("elapsed_ms") for entry in items]
+        elapsed = [value for value in elapsed if value is not None]
+        # [entry count, metric totals, elapsed_ms sum, elapsed_ms count]; see merge_aggregates.
+        aggregates[label] = [len(items), totals, sum(elapsed), len(elapsed)]
+    return aggregates
+
+
+def merge_aggregates(parts):
+    merged = {}
+    for part in parts:
+        for label, (count, totals, elapsed_sum, elapsed_count) in part.items():
+            current = merged.get(label)
+            if current is None:
+                merged[label] = [count, dict(totals), elapsed_sum, elapsed_count]
+                continue
+            current[0] += count
+            current_totals = current[1]
+            for key, value in totals.items():
+                current_totals[key] = current_totals.get(key, 0.0) + value
+            current[2] += elapsed_sum
+            current[3] += elapsed_count
+    return merged
+
+
+def finalize(aggregates):
+    results = {}
+    for label, (count, totals, elapsed_sum, elapsed_count) in aggregates.items():
+        totals = dict(totals)
+        avg_elapsed = elapsed_sum / elapsed_count if elapsed_count else None
         throughput = None
-        if avg_elapsed and totals["base_events"] > 0:
-            throughput = (totals["base_events"] / len(items)) / (avg_elapsed / 1000.0)
+        if avg_elapsed:
+            base_events = totals.setdefault("base_events", 0.0)
+            if base_events > 0:
+                throughput = (base_events / count) / (avg_elapsed / 1000.0)
         results[label] = {
-            "count": len(items),
-            **{k: totals[k] for k in totals},
+            "count": count,
+            **totals,
         }
         if avg_elapsed is not None:
             results[label]["avg_elapsed_ms"] = avg_elapsed
@@ -79,7 +157,42 @@ def summarize(metrics):
     return results
 
 
+def summarize(metrics):
+    return finalize(aggregate(metrics))
+
+
+def _has_non_finite(data):
+    for value in data.values():
+        if isinstance(value, dict):
+            if _has_non_finite(value):
+                return True
+        elif isinstance(value, float) and not math.isfinite(value):
+            return True
+    return False
+
+
+def write_json(data, pretty):
+    # orjson writes NaN and Infinity as null; only the stdlib encoder keeps them.
+    if orjson is not None and not _has_non_finite(data):
+        option = orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        try:
+            sys.stdout.buffer.write(orjson.dumps(data, option=option))
+            return
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits (e.g. labels); the stdlib encoder handles them.
+            pass
+    if pretty:
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+    else:
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+    sys.stdout.buffer.write(text.encode("utf-8") + b"\n")
+
+
 def write_csv(rows, dest):
+    import csv
+
     fieldnames = [
         "file",
         "label",
@@ -93,13 +206,17 @@ def write_csv(rows, dest):
         "avg_elapsed_ms",
         "avg_base_throughput_per_sec",
     ]
-    writer = csv.DictWriter(dest, fieldnames=fieldnames)
-    writer.writeheader()
-    for row in rows:
-        writer.writerow(row)
+    writer = csv.writer(dest)
+    writer.writerow(fieldnames)
+    writer.writerows(rows)
 
 
-def main():
+ARG_DEFAULTS = {"paths": [], "pretty": False, "per_file": False, "csv": False}
+
+
+def build_parser():
+    import argparse
+
     parser = argparse.ArgumentParser(description="Summarize Timely Worlds metrics JSON lines.")
     parser.add_argument("paths", nargs="*", help="Files to parse (defaults to stdin if none).")
     parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON output (JSON mode only).")
@@ -113,56 +230,56 @@ def main():
         action="store_true",
         help="Output CSV instead of JSON (implies --per-file).",
     )
-    args = parser.parse_args()
+    parser.set_defaults(**{**ARG_DEFAULTS, "paths": []})
+    return parser
 
-    if args.csv:
-        args.per_file = True
 
-    bundles = load_metrics(args.paths)
+def parse_args(argv):
+    # Bare `summarize_metrics.py [FILE]` needs no option parsing; skip importing argparse.
+    if not argv or (len(argv) == 1 and not argv[0].startswith("-")):
+        return SimpleNamespace(**{**ARG_DEFAULTS, "paths": list(argv)})
+    return build_parser().parse_args(argv)
+
 
-    if args.per_file:
+def main():
+    args = parse_args(sys.argv[1:])
+
+    file_aggregates = aggregate_files(args.paths)
+
+    if args.csv:
         rows = []
+        for path, aggregates in file_aggregates:
+            for label, stats in finalize(aggregates).items():
+                rows.append(
+                    (
+                        path,
+                        label,
+                        stats["count"],
+                        *[stats.get(key, 0) for key in METRIC_KEYS],
+                        stats.get("avg_elapsed_ms"),
+                        stats.get("avg_base_throughput_per_sec"),
+                    )
+                )
+        # A private fully buffered writer avoids per-row flushes when stdout is a tty.
+        out = io.TextIOWrapper(
+            sys.stdout.buffer,
+            encoding=sys.stdout.encoding,
+            errors=sys.stdout.errors,
+            newline="",
+        )
+        try:
+            write_csv(rows, out)
+        finally:
+            out.detach()
+    elif args.per_file:
         summaries = {}
-        for path, metrics in bundles:
-            if not metrics:
-                continue
-            summary = summarize(metrics)
-            summaries[path] = summary
-            for label, stats in summary.items():
-                row = {
-                    "file": path,
-                    "label": label,
-                    "count": stats.get("count", 0),
-                    "base_events": stats.get("base_events", 0),
-                    "predicted_events": stats.get("predicted_events", 0),
-                    "scenario_created": stats.get("scenario_created", 0),
-                    "scenario_retired": stats.get("scenario_retired", 0),
-                    "scenario_alerts": stats.get("scenario_alerts", 0),
-                    "scenario_active_peak": stats.get("scenario_active_peak", 0),
-                    "avg_elapsed_ms": stats.get("avg_elapsed_ms"),
-                    "avg_base_throughput_per_sec": stats.get("avg_base_throughput_per_sec"),
-                }
-                rows.append(row)
-        if args.csv:
-            write_csv(rows, sys.stdout)
-        else:
-            if args.pretty:
-                json.dump(summaries, sys.stdout, indent=2)
-            else:
-                json.dump(summaries, sys.stdout)
-            sys.stdout.write("\n")
+        for path, aggregates in file_aggregates:
+            summary = finalize(aggregates)
+            if summary:
+                summaries[path] = summary
+        write_json(summaries, args.pretty)
     else:
-        merged = []
-        for _path, metrics in bundles:
-            merged.extend(metrics)
-        if not merged:
-            print("{}", end="\n")
-            return
-        summary = summarize(merged)
-        if args.pretty:
-            json.dump(summary, sys.stdout, indent=2)
-        else:
-            json.dump(summary, sys.stdout)
-        sys.stdout.write("\n")
+        summary = finalize(merge_aggregates(aggregates for _path, aggregates in file_aggregates))
+        write_json(summary, args.pretty)
 if __name__ == "__main__":
     main()
@@ -0,0 +1,209 @@
+import json
+import math
+import subprocess
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+SCRIPT = Path(__file__).with_name("summarize_metrics.py")
+
+# Imported by name (not from a spec) so pool workers can unpickle its functions.
+sys.path.insert(0, str(SCRIPT.parent))
+import summarize_metrics  # noqa: E402
+
+
+def run_script(stdin, *args, without_orjson=False):
+    command = [sys.executable, str(SCRIPT), *args]
+    if without_orjson:
+        command[1:2] = [
+            "-c",
+            "import runpy, sys; sys.modules['orjson'] = None; "
+            "del sys.argv[0]; runpy.run_path(sys.argv[0], run_name='__main__')",
+            str(SCRIPT),
+        ]
+    result = subprocess.run(
+        command,
+        input=stdin,
+        capture_output=True,
+        check=True,
+    )
+    return result.stdout
+
+
+class ParseLineTest(unittest.TestCase):
+    def test_json_payload_after_log_prefix(self):
+        line = b'2025-01-01T00:00:00Z INFO epoch complete epoch=3 json={"label":"x","base_events":2}\n'
+        self.assertEqual(summarize_metrics.parse_line(line), {"label": "x", "base_events": 2})
+
+    def test_bare_json_object_line(self):
+        line = b'{"label":"x","elapsed_ms":1.5}\n'
+        self.assertEqual(summarize_metrics.parse_line(line), {"label": "x", "elapsed_ms": 1.5})
+
+    def test_payload_without_label_is_skipped(self):
+        self.assertIsNone(summarize_metrics.parse_line(b'INFO json={"base_events":2}\n'))
+        self.assertIsNone(summarize_metrics.parse_line(b'{"base_events":2}\n'))
+
+    def test_invalid_utf8_is_skipped(self):
+        self.assertIsNone(summarize_metrics.parse_line(b'INFO json={"label":"x\xff"}\n'))
+        self.assertIsNone(summarize_metrics.parse_line(b'{"label":"x\xff"}\n'))
+
+
+class SummarizeMetricsTest(unittest.TestCase):
+    def test_non_string_labels_are_written_as_json_keys(self):
+        stdin = (
+            b'json={"label":5,"base_events":2,"elapsed_ms":4}\n'
+            b'json={"label":null,"base_events":3,"elapsed_ms":2}\n'
+        )
+        for args in ((), ("--pretty",), ("--per-file",)):
+            with self.subTest(args=args):
+                summary = json.loads(run_script(stdin, *args))
+                if args == ("--per-file",):
+                    summary = summary["-"]
+                self.assertEqual(set(summary), {"5", "null"})
+                self.assertEqual(summary["5"]["base_events"], 2.0)
+                self.assertEqual(summary["null"]["count"], 1)
+
+    def test_non_finite_values_are_not_dropped(self):
+        stdin = (
+            b'json={"label":"x","base_events":2,"elapsed_ms":1}\n'
+            b'json={"label":"x","base_events":3,"elapsed_ms":NaN}\n'
+        )
+        summary = json.loads(run_script(stdin))
+        self.assertEqual(summary["x"]["count"], 2)
+        self.assertEqual(summary["x"]["base_events"], 5.0)
+
+    def test_non_finite_averages_are_written_the_same_with_and_without_orjson(self):
+        stdin = (
+            b'json={"label":"x","base_events":2,"elapsed_ms":NaN}\n'
+            b'json={"label":"y","base_events":2,"elapsed_ms":Infinity}\n'
+        )
+        for args in ((), ("--pretty",)):
+            with self.subTest(args=args):
+                output = run_script(stdin, *args)
+                self.assertEqual(output, run_script(stdin, *args, without_orjson=True))
+                self.assertIn(b"NaN", output)
+                self.assertIn(b"Infinity", output)
+
+    def test_overflowing_elapsed_sum_does_not_raise(self):
+        stdin = (
+            b'json={"label":"x","base_events":2,"elapsed_ms":1e308}\n'
+            b'json={"label":"x","base_events":2,"elapsed_ms":1e308}\n'
+        )
+        summary = json.loads(run_script(stdin))
+        self.assertEqual(summary["x"]["avg_elapsed_ms"], float("inf"))
+
+    def test_opposite_infinite_elapsed_times_average_to_nan(self):
+        stdin = (
+            b'json={"label":"x","base_events":2,"elapsed_ms":Infinity}\n'
+            b'json={"label":"x","base_events":2,"elapsed_ms":-Infinity}\n'
+        )
+        summary = json.loads(run_script(stdin))
+        self.assertTrue(math.isnan(summary["x"]["avg_elapsed_ms"]))
+
+    def test_output_does_not_depend_on_orjson(self):
+        stdin = (
+            b'json={"label":"caf\xc3\xa9","base_events":2,"elapsed_ms":4}\n'
+            b'json={"label":7,"predicted_events":1,"elapsed_ms":2.5}\n'
+            b'json={"label":123456789012345678901234,"base_events":1}\n'
+        )
+        for args in ((), ("--pretty",), ("--per-file",)):
+            with self.subTest(args=args):
+                self.assertEqual(
+                    run_script(stdin, *args),
+                    run_script(stdin, *args, without_orjson=True),
+                )
+
+    def test_big_integer_labels_keep_their_exact_value(self):
+        stdin = b'json={"label":123456789012345678901234,"base_events":1}\n'
+        self.assertEqual(
+            run_script(stdin),
+            b'{"123456789012345678901234":{"count":1,"base_events":1.0}}\n',
+        )
+
+    def test_timed_label_without_base_events_reports_zero_total(self):
+        stdin = b'json={"label":"x","predicted_events":4,"elapsed_ms":2}\n'
+        summary = json.loads(run_script(stdin))
+        self.assertEqual(
+            summary["x"],
+            {"count": 1, "predicted_events": 4.0, "base_events": 0.0, "avg_elapsed_ms": 2.0},
+        )
+        rows = run_script(stdin, "--csv").decode().splitlines()
+        self.assertEqual(rows[1], "-,x,1,0.0,4.0,0,0,0,0,2.0,")
+
+    def test_metric_keys_keep_first_seen_order(self):
+        stdin = (
+            b'json={"label":"x","predicted_events":1}\n'
+            b'json={"label":"x","scenario_alerts":2,"base_events":3}\n'
+        )
+        summary = json.loads(run_script(stdin))
+        self.assertEqual(
+            list(summary["x"]),
+            ["count", "predicted_events", "base_events", "scenario_alerts"],
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = Path(tmp, "a.jsonl"), Path(tmp, "b.jsonl")
+            first.write_bytes(stdin.splitlines(keepends=True)[0])
+            second.write_bytes(stdin.splitlines(keepends=True)[1])
+            merged = json.loads(run_script(b"", str(first), str(second)))
+        self.assertEqual(merged, summary)
+        self.assertEqual(list(merged["x"]), list(summary["x"]))
+
+    def test_fast_path_arguments_match_argparse(self):
+        parser = summarize_metrics.build_parser()
+        for argv in ([], ["run.jsonl"]):
+            with self.subTest(argv=argv):
+                self.assertEqual(
+                    vars(summarize_metrics.parse_args(argv)),
+                    vars(parser.parse_args(argv)),
+                )
+
+    def test_merged_aggregates_match_single_pass_summary(self):
+        first = [
+            {"label": "a", "base_events": 2, "elapsed_ms": 4.0},
+            {"label": "b", "predicted_events": 1, "elapsed_ms": None},
+        ]
+        second = [
+            {"label": "b", "base_events": 5, "predicted_events": 2, "elapsed_ms": 2.0},
+            {"label": "a", "base_events": 1, "scenario_alerts": 3},
+        ]
+        merged = summarize_metrics.merge_aggregates(
+            [summarize_metrics.aggregate(first), summarize_metrics.aggregate(second)]
+        )
+        self.assertEqual(
+            summarize_metrics.finalize(merged),
+            summarize_metrics.summarize(first + second),
+        )
+
+    def test_process_pool_matches_serial_aggregation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for index in range(3):
+                path = Path(tmp, f"run{index}.jsonl")
+                path.write_bytes(
+                    b'INFO epoch complete json={"label":"epoch","base_events":%d,"elapsed_ms":%d.5}\n'
+                    b'INFO unrelated line\n'
+                    b'{"label":"final","predicted_events":%d,"elapsed_ms":null}\n'
+                    % (index + 1, index + 2, index * 3)
+                )
+                paths.append(str(path))
+            serial = summarize_metrics.aggregate_files(paths)
+            mapped = []
+
+            class RecordingExecutor(ProcessPoolExecutor):
+                def map(self, fn, *iterables, **kwargs):
+                    mapped.append(fn)
+                    return super().map(fn, *iterables, **kwargs)
+
+            with mock.patch.object(summarize_metrics, "PARALLEL_MIN_BYTES", 0), mock.patch(
+                "os.cpu_count", return_value=len(paths)
+            ), mock.patch("concurrent.futures.ProcessPoolExecutor", RecordingExecutor):
+                pooled = summarize_metrics.aggregate_files(paths)
+            self.assertEqual(mapped, [summarize_metrics._aggregate_one])
+        self.assertEqual(pooled, serial)
+
+
+if __name__ == "__main__":
+    unittest.main()